@@ -1,9 +1,16 @@
 # --- Structural chunking (HTML) + Ablation update ---
 # -------------------- imports & setup --------------------
-import os, re, json, time, math, statistics
-from typing import List, Dict, Tuple
-import requests
-from bs4 import BeautifulSoup
+import os, re, csv, time, math, asyncio
+import multiprocessing as mp
+import numpy as np
+import orjson
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from typing import List, Dict, Tuple, Optional
+from urllib.parse import urlparse
+import requests_cache
+import diskcache
+from bs4 import BeautifulSoup, SoupStrainer
 from dotenv import load_dotenv
 from tqdm import tqdm
 
@@ -26,7 +33,7 @@ from sklearn.metrics.pairwise import cosine_similarity
 import google.generativeai as genai
 
 # Playwright (for structural HTML fallback on SPA)
-from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright
 
 from pathlib import Path
 
@@ -35,77 +42,191 @@ SECTIONS_JSON = Path(r"C:\\Users\\harsh\\OneDrive\\Desktop\\LLM Assignment 2\\Sc
 OUT_DIR = Path(r"C:\\Users\\harsh\\OneDrive\\Desktop\\LLM Assignment 2\\Chunking\\chunks")
 ABLATION_CSV = Path(r"C:\\Users\\harsh\\OneDrive\\Desktop\\LLM Assignment 2\\Chunking\\chunking_ablation.csv")
 
-tokenizer = AutoTokenizer.from_pretrained("bert-base-uncased")
+FETCH_WORKERS = 16                   # threads for plain HTTP fetches
+PARSE_WORKERS = os.cpu_count() or 1  # upper bound on parse + chunk + tokenize processes
+PW_MAX_PARALLEL = 6
+# jiopay.com renders no h1-h3/main; the footer's last link ("BillPay Terms &
+# Conditions", present on every page in scraped_data_playwright.json) marks a
+# fully rendered app tree
+PW_READY_SELECTOR = "text=BillPay Terms & Conditions"
+PW_READY_TIMEOUT_MS = 10000
+# text-only fallback: skip bytes that never reach the chunker
+PW_BLOCKED_RESOURCES = frozenset({"image", "media", "font", "stylesheet"})
+HTML_CACHE_TTL = 86400  # seconds; shell fallback freshness + lifetime of rendered HTML
 
-def tok_count(text: str) -> int:
-    return len(tokenizer.encode(text or "", add_special_tokens=False))
+# on-disk (sqlite) HTTP cache keyed by URL; only successful responses are stored,
+# together with their headers. Server Cache-Control wins over HTML_CACHE_TTL, and
+# once an entry is stale it is revalidated with If-None-Match / If-Modified-Since,
+# so an unchanged page costs a 304 instead of a full body.
+_http = requests_cache.CachedSession(
+    cache_name=str(DATA / "_html_cache"), backend="sqlite",
+    expire_after=HTML_CACHE_TTL, cache_control=True,
+)
+
+# Every jiopay.com route is a JS shell, so the HTML the chunker actually uses comes
+# from Playwright. Rendered pages are cached under ("pw", url, shell validator):
+# an unchanged shell (fresh, or revalidated with a 304) reuses the render, a new
+# ETag/Last-Modified forces a re-render, and entries expire after HTML_CACHE_TTL.
+_rendered = diskcache.Cache(str(DATA / "_rendered_cache"))
+
+tokenizer = None  # loaded once per parse worker by _init_worker
+
+def _init_worker() -> None:
+    global tokenizer
+    tokenizer = AutoTokenizer.from_pretrained("bert-base-uncased", use_fast=True)
+
+def tok_counts(texts: List[str]) -> List[int]:
+    # one batched call into the Rust tokenizer instead of one call per chunk
+    if not texts:
+        return []
+    return tokenizer(texts, add_special_tokens=False, return_length=True)["length"]
 
 # ---------- HTML fetchers ----------
-def _looks_like_spa_shell(html: str) -> bool:
-    if not html:
+# only build the tags the chunker reads or strips; everything else is skipped at parse time
+_STRUCT_STRAINER = SoupStrainer(["h1","h2","h3","p","li","script","style","noscript","svg","header","footer","nav"])
+
+def _parse_html(html: str) -> BeautifulSoup:
+    return BeautifulSoup(html, "lxml", parse_only=_STRUCT_STRAINER)
+
+# URL path prefixes known to be server-rendered; these skip the SPA check entirely.
+# Empty for jiopay.com: scraped_data_requests.json shows every route, policies
+# included, comes back from plain HTTP as a JS shell.
+STATIC_URL_PREFIXES: Tuple[str, ...] = ()
+SPA_PROBE_CHARS = 8192  # shells put their <noscript> notice near the top
+_SPA_MARKER_RE = re.compile(r"enable javascript", re.I)
+
+def _is_known_static(url: str) -> bool:
+    return bool(STATIC_URL_PREFIXES) and urlparse(url).path.startswith(STATIC_URL_PREFIXES)
+
+def _spa_marker_in_head(html: str) -> bool:
+    # bounded regex probe on the raw text; no parse needed to spot an obvious shell
+    return not html or _SPA_MARKER_RE.search(html, 0, SPA_PROBE_CHARS) is not None
+
+def _looks_like_spa_shell(html: str, soup: Optional[BeautifulSoup]) -> bool:
+    # quick heuristic: "enable javascript" near the top, or no headings.
+    # The marker is probed on the raw html: the strained soup drops <title> and
+    # div/span text, so it is only used for the heading check.
+    if _spa_marker_in_head(html) or soup is None:
         return True
-    # quick heuristic: very few headings or "enable javascript"
-    soup = BeautifulSoup(html, "lxml")
-    head_cnt = len(soup.find_all(["h1","h2","h3"]))
-    txt_head = " ".join(soup.stripped_strings)[:600].lower()
-    return ("enable javascript" in txt_head) or (head_cnt == 0)
+    return not (soup.find("h1") or soup.find("h2") or soup.find("h3"))
 
-def fetch_html_requests(url: str) -> str:
+def fetch_html_requests(url: str) -> Tuple[str, str]:
+    """
+    Returns (html, validator); validator is the shell's ETag or Last-Modified
+    ("" if the server sends neither) and keys the rendered-HTML cache.
+    """
     try:
-        r = requests.get(url, headers={"User-Agent":"Mozilla/5.0"}, timeout=25)
+        r = _http.get(url, headers={"User-Agent":"Mozilla/5.0"}, timeout=25)
         r.raise_for_status()
-        return r.text
+        return r.text, r.headers.get("ETag") or r.headers.get("Last-Modified") or ""
     except Exception:
-        return ""
+        return "", ""
 
-def fetch_html_playwright(url: str) -> str:
-    try:
-        from playwright.sync_api import sync_playwright
-    except Exception as e:
-        print("Playwright not available:", e)
-        return ""
-    html = ""
-    with sync_playwright() as pw:
-        browser = pw.chromium.launch(headless=True)
-        page = browser.new_page(user_agent="Mozilla/5.0")
+async def _block_heavy(route):
+    if route.request.resource_type in PW_BLOCKED_RESOURCES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+class PWFetcher:
+    """
+    One Chromium launch for the lifetime of the `async with` block; every
+    fetch() gets a fresh BrowserContext, at most PW_MAX_PARALLEL at a time.
+    """
+    def __init__(self, max_parallel: int = PW_MAX_PARALLEL):
+        self._sem = asyncio.Semaphore(max_parallel)
+        self._pw = None
+        self.browser = None
+
+    async def __aenter__(self) -> "PWFetcher":
+        self._pw = await async_playwright().start()
         try:
-            page.goto(url, wait_until="networkidle", timeout=60000)
-            try:
-                page.evaluate("""async () => {
-                  let h=document.body.scrollHeight, y=0;
-                  while (y<h){ y+=Math.max(300, Math.floor(window.innerHeight*0.9));
-                    window.scrollTo(0,y); await new Promise(r=>setTimeout(r,80));
-                    h=document.body.scrollHeight;}
-                }""")
-            except:
-                pass
-            html = page.content()
+            self.browser = await self._pw.chromium.launch(headless=True)
         except Exception:
-            html = ""
+            # __aexit__ won't run if we raise here; don't leak the driver
+            await self._pw.stop()
+            raise
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        try:
+            await self.browser.close()
         finally:
-            page.close()
-            browser.close()
-    return html
+            await self._pw.stop()
+
+    async def fetch(self, url: str) -> str:
+        async with self._sem:
+            ctx = await self.browser.new_context(user_agent="Mozilla/5.0")
+            try:
+                await ctx.route("**/*", _block_heavy)
+                page = await ctx.new_page()
+                # networkidle rarely settles on this site; wait for DOM + the rendered footer instead
+                await page.goto(url, wait_until="domcontentloaded", timeout=60000)
+                try:
+                    await page.wait_for_selector(PW_READY_SELECTOR, timeout=PW_READY_TIMEOUT_MS)
+                except:
+                    pass
+                try:
+                    await page.evaluate("""async () => {
+                      let h=document.body.scrollHeight, y=0;
+                      while (y<h){ y+=Math.max(300, Math.floor(window.innerHeight*0.9));
+                        window.scrollTo(0,y); await new Promise(r=>setTimeout(r,80));
+                        h=document.body.scrollHeight;}
+                    }""")
+                except:
+                    pass
+                return await page.content()
+            except Exception:
+                return ""
+            finally:
+                await ctx.close()
 
-def fetch_structural_html(url: str) -> str:
-    html = fetch_html_requests(url)
-    if _looks_like_spa_shell(html):
-        html = fetch_html_playwright(url)
-    return html or ""
+async def _fetch_html_playwright_async(urls: List[str]) -> Dict[str, str]:
+    async with PWFetcher() as pw:
+        htmls = await asyncio.gather(*(pw.fetch(u) for u in urls))
+    return dict(zip(urls, htmls))
+
+def fetch_html_playwright(urls: List[str], validators: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """
+    Render all SPA-shell URLs in one browser, PW_MAX_PARALLEL contexts at a time.
+    Pages still in the rendered cache are served from disk; the browser is only
+    launched for misses. Returns {url: html}; failed URLs map to "".
+    """
+    validators = validators or {}
+    keys = {u: ("pw", u, validators.get(u, "")) for u in urls}
+    out = {u: _rendered.get(keys[u]) for u in urls}
+    misses = [u for u, html in out.items() if html is None]
+    if not misses:
+        return out
+    try:
+        from playwright.async_api import async_playwright
+    except Exception as e:
+        print("Playwright not available:", e)
+        return {u: html or "" for u, html in out.items()}
+    for u, html in asyncio.run(_fetch_html_playwright_async(misses)).items():
+        out[u] = html
+        if html:
+            _rendered.set(keys[u], html, expire=HTML_CACHE_TTL)
+    return out
 
 # ---------- Structural chunker (preserve hierarchy) ----------
-def structural_chunks_from_html(html: str) -> List[str]:
+_CHUNK_TAGS = frozenset({"h1","h2","h3","p","li"})
+
+def structural_chunks_from_html(html: str, soup: Optional[BeautifulSoup] = None) -> List[str]:
     """
     Produce chunks with heading context:
     "H1 > H2 > H3\nparagraph/list block"
+    Pass an already-parsed `soup` to skip re-parsing `html`.
     """
-    if not html:
-        return []
-    soup = BeautifulSoup(html, "lxml")
+    if soup is None:
+        if not html:
+            return []
+        soup = _parse_html(html)
     for el in soup(["script","style","noscript","svg","header","footer","nav"]):
         el.decompose()
 
-    elements = soup.find_all(["h1","h2","h3","p","li"], recursive=True)
+    # single document-order walk; same elements as find_all(_CHUNK_TAGS) without the ResultSet
+    elements = (el for el in soup.descendants if getattr(el, "name", None) in _CHUNK_TAGS)
     h = {1: None, 2: None, 3: None}
     buf, out = [], []
 
@@ -134,78 +255,145 @@ def structural_chunks_from_html(html: str) -> List[str]:
             buf.append(txt)
     flush()
     # remove empty/tiny
-    out = [c for c in out if tok_count(c) > 0]
+    out = [c for c in out if len(c.strip()) > 0]
     return out
 
+def _chunk_doc(url: str, html: str, allow_fallback: bool) -> Tuple[str, Optional[List[Tuple[str, int]]]]:
+    """
+    Parse-stage worker: parse once, run the SPA check on that soup, then chunk
+    and tokenize. Returns (url, None) when the page needs the Playwright fallback.
+    """
+    soup = _parse_html(html) if html else None
+    if allow_fallback and _looks_like_spa_shell(html, soup):
+        return url, None
+    chunks = structural_chunks_from_html(html, soup)
+    return url, list(zip(chunks, tok_counts(chunks)))
+
+# ---------- Ablation CSV (single read + single rewrite; values kept verbatim) ----------
+def update_ablation_csv(path: Path, row: Dict) -> None:
+    fieldnames, kept = list(row.keys()), []
+    if path.exists():
+        with path.open("r", newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            fieldnames = list(reader.fieldnames or []) + [k for k in row if k not in (reader.fieldnames or [])]
+            # drop prior row(s) for this strategy/config
+            kept = [r for r in reader
+                    if not (r.get("strategy") == row["strategy"] and r.get("config") == row["config"])]
+    with path.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, restval="")
+        writer.writeheader()
+        writer.writerows(kept)
+        writer.writerow(row)
+
 # ---------- Run structural chunking over jiopay_sections.json ----------
-cfg_name = "structural_html"
-rows = []
-t0 = time.time()
-
-docs = json.loads(SECTIONS_JSON.read_text(encoding="utf-8"))
-for d in docs:
-    url = d.get("url","")
-    section = d.get("section","")
-    if not url:
-        continue
-    html = fetch_structural_html(url)
-    chunks = structural_chunks_from_html(html)
-    for ch in chunks:
-        rows.append({
+def run_structural(docs: List[Dict], cfg_name: str, out_jsonl: Path) -> List[int]:
+    """
+    fetch stage (threads) -> parse stage (processes), joined by as_completed.
+    SPA shells (raw-text probe in the fetch stage, heading check in the parse
+    stage) are rendered in one Playwright batch and sent back through the
+    parse pool. Each URL's chunks are written (and flushed) as soon as they
+    are ready, so the JSONL is in completion order, not `docs` order.
+    Returns the per-chunk token counts.
+    """
+    toks = []
+    sections = defaultdict(list)  # url -> sections of every doc pointing at it
+    for d in docs:
+        sections[d["url"]].append(d.get("section",""))
+
+    # spawn: workers never fork a process that already runs fetch threads, and
+    # only as many are started (each loads the tokenizer) as there are URLs
+    n_workers = max(1, min(PARSE_WORKERS, len(sections)))
+    with out_jsonl.open("wb") as f, \
+         ProcessPoolExecutor(max_workers=n_workers, mp_context=mp.get_context("spawn"),
+                             initializer=_init_worker) as parse_pool, \
+         ThreadPoolExecutor(max_workers=FETCH_WORKERS) as fetch_pool:
+
+        def emit(url: str, chunks: List[Tuple[str, int]]) -> None:
+            for section in sections[url]:
+                for ch, n_tok in chunks:
+                    f.write(orjson.dumps({
+                        "strategy": "structural",
+                        "config": cfg_name,
+                        "url": url,
+                        "section": section,
+                        "text": ch,
+                        "tokens": n_tok
+                    }) + b"\n")
+                    toks.append(n_tok)
+            # keep everything written so far if a later URL fails
+            f.flush()
+
+        fetches = {fetch_pool.submit(fetch_html_requests, u): u for u in sections}
+        parses, spa_urls, validators = [], [], {}
+        for fut in as_completed(fetches):
+            url, (html, validators[url]) = fetches[fut], fut.result()
+            if _is_known_static(url):
+                parses.append(parse_pool.submit(_chunk_doc, url, html, False))
+            elif _spa_marker_in_head(html):
+                spa_urls.append(url)  # obvious shell: straight to Playwright, never parsed
+            else:
+                parses.append(parse_pool.submit(_chunk_doc, url, html, True))
+
+        for fut in as_completed(parses):
+            url, chunks = fut.result()
+            if chunks is None:
+                spa_urls.append(url)
+            else:
+                emit(url, chunks)
+
+        rendered = fetch_html_playwright(spa_urls, validators)
+        reparses = [parse_pool.submit(_chunk_doc, u, rendered.get(u, ""), False) for u in spa_urls]
+        for fut in as_completed(reparses):
+            emit(*fut.result())
+
+    return toks
+
+def main():
+    cfg_name = "structural_html"
+    t0 = time.time()
+
+    out_jsonl = OUT_DIR / f"chunks_{cfg_name}.jsonl"
+    out_jsonl.parent.mkdir(parents=True, exist_ok=True)
+
+    docs = orjson.loads(SECTIONS_JSON.read_bytes())
+    docs = [d for d in docs if d.get("url","")]
+    toks = run_structural(docs, cfg_name, out_jsonl)
+
+    elapsed = round(time.time() - t0, 2)
+
+    # Compute ablation row
+    if toks:
+        tok_arr = np.fromiter(toks, dtype=np.int64, count=len(toks))
+        ablation_row = {
+            "strategy": "structural",
+            "config": cfg_name,
+            "#chunks": int(tok_arr.size),
+            "tokens_total": int(tok_arr.sum()),
+            "avg_tokens": round(float(tok_arr.mean()), 2),
+            # population std (ddof=0), same as statistics.pstdev
+            "std_tokens": round(float(tok_arr.std()), 2) if tok_arr.size > 1 else 0.0,
+            "time_sec": elapsed,
+            "redundancy_pct": 0.0
+        }
+    else:
+        ablation_row = {
             "strategy": "structural",
             "config": cfg_name,
-            "url": url,
-            "section": section,
-            "text": ch,
-            "tokens": tok_count(ch)
-        })
-
-elapsed = round(time.time() - t0, 2)
-
-# Save chunks
-out_jsonl = OUT_DIR / f"chunks_{cfg_name}.jsonl"
-out_jsonl.parent.mkdir(parents=True, exist_ok=True)
-with out_jsonl.open("w", encoding="utf-8") as f:
-    for r in rows:
-        f.write(json.dumps(r, ensure_ascii=False) + "\n")
-
-# Compute ablation row
-if rows:
-    toks = [r["tokens"] for r in rows]
-    ablation_row = {
-        "strategy": "structural",
-        "config": cfg_name,
-        "#chunks": len(rows),
-        "tokens_total": int(sum(toks)),
-        "avg_tokens": round(sum(toks)/len(toks), 2),
-        "std_tokens": round(statistics.pstdev(toks), 2) if len(toks) > 1 else 0.0,
-        "time_sec": elapsed,
-        "redundancy_pct": 0.0
-    }
-else:
-    ablation_row = {
-        "strategy": "structural",
-        "config": cfg_name,
-        "#chunks": 0,
-        "tokens_total": 0,
-        "avg_tokens": 0.0,
-        "std_tokens": 0.0,
-        "time_sec": elapsed,
-        "redundancy_pct": 0.0
-    }
-
-# Update/replace row in ablation CSV
-if ABLATION_CSV.exists():
-    df = pd.read_csv(ABLATION_CSV)
-    # drop prior structural row(s)
-    df = df[~((df["strategy"]=="structural") & (df["config"]==cfg_name))].copy()
-    df = pd.concat([df, pd.DataFrame([ablation_row])], ignore_index=True)
-else:
-    df = pd.DataFrame([ablation_row])
-
-df.to_csv(ABLATION_CSV, index=False)
-
-print(f"Structural chunks written -> {out_jsonl}")
-print("Ablation row:")
-print(pd.DataFrame([ablation_row]))
-print(f"Ablation CSV updated -> {ABLATION_CSV}")
+            "#chunks": 0,
+            "tokens_total": 0,
+            "avg_tokens": 0.0,
+            "std_tokens": 0.0,
+            "time_sec": elapsed,
+            "redundancy_pct": 0.0
+        }
+
+    # Update/replace row in ablation CSV
+    update_ablation_csv(ABLATION_CSV, ablation_row)
+
+    print(f"Structural chunks written -> {out_jsonl}")
+    print("Ablation row:")
+    print(pd.DataFrame([ablation_row]))
+    print(f"Ablation CSV updated -> {ABLATION_CSV}")
+
+if __name__ == "__main__":
+    main()
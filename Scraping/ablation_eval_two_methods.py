@@ -1,9 +1,10 @@
 # scrape_ablation_two_methods.py
-import re, time, json, asyncio
+import re, time, asyncio
+import orjson
 from pathlib import Path
 from typing import List, Dict
-import requests
-from bs4 import BeautifulSoup
+import aiohttp
+from lxml import html as lxml_html, etree
 from tqdm import tqdm
 from playwright.async_api import async_playwright
 import pandas as pd
@@ -18,25 +19,63 @@ ABL_PER  = DATA / "ingestion_ablation_perurl.csv"
 HEADERS = {"User-Agent": "Mozilla/5.0"}
 REQUEST_TIMEOUT = 25
 PW_TIMEOUT_MS = 60000
+REQ_PER_HOST = 16
+REQ_RETRIES = 2
+PW_MAX_PARALLEL = 6
+# last footer link, rendered on every page (see data/scraped_data_playwright.json);
+# the site has no h1-h3/main to wait on
+PW_READY_SELECTOR = "text=BillPay Terms & Conditions"
+PW_READY_TIMEOUT_MS = 10000
+# text-only scrape: skip bytes that never reach the cleaner
+PW_BLOCKED_RESOURCES = frozenset({"image", "media", "font", "stylesheet"})
 
 # ---------- shared cleaner (keep ablation fair) ----------
+_DROP_TAGS = ("script","style","noscript","svg","header","footer","nav")
+_HERO_HEADINGS = ("Our Products", "Why JioPay?", "Digital payment acceptance made easy")
+# first h1-h3 (document order) containing $needle; compiled once at import
+_HERO_XPATH = etree.XPath("(//h1|//h2|//h3)[contains(., $needle)][1]")
+_WS_RE = re.compile(r"\s+")
+_WORD_RE = re.compile(r"[A-Za-z0-9]+")
+
+def _pad_tail(el) -> None:
+    # stripping/dropping el splices its tail onto the preceding text; keep a
+    # word boundary there, as get_text(" ") did
+    if el.tail:
+        el.tail = " " + el.tail
+
 def parse_text_from_html(html: str) -> str:
-    soup = BeautifulSoup(html or "", "lxml")
-    for el in soup(["script","style","noscript","svg","header","footer","nav"]):
-        el.decompose()
+    """
+    >>> parse_text_from_html("<p>Pay<script>x</script>now</p>")
+    'Pay now'
+    >>> parse_text_from_html("<nav>x</nav>")
+    ''
+    """
+    if not html or not html.strip():
+        return ""
+    try:
+        # document_fromstring: root is always <html>, so a dropped tag never is
+        doc = lxml_html.document_fromstring(html)
+    except ValueError:
+        # str input carrying an XML encoding declaration
+        doc = lxml_html.document_fromstring(html.encode("utf-8"))
+    except etree.ParserError:
+        return ""
+    for el in doc.iter(etree.Comment, *_DROP_TAGS):
+        _pad_tail(el)
+    etree.strip_elements(doc, etree.Comment, *_DROP_TAGS, with_tail=False)
     # optional: drop common hero-ish sections if present
-    def drop_by_heading(needle: str):
-        h = soup.find(lambda tag: tag.name in ["h1","h2","h3"] and needle in (tag.get_text() or ""))
-        if h:
-            p = h.find_parent()
-            if p: p.decompose()
-    for key in ["Our Products", "Why JioPay?", "Digital payment acceptance made easy"]:
-        drop_by_heading(key)
-    text = soup.get_text(separator=" ", strip=True)
-    return re.sub(r"\s+", " ", text).strip()
+    for key in _HERO_HEADINGS:
+        hits = _HERO_XPATH(doc, needle=key)
+        if hits:
+            p = hits[0].getparent()
+            if p is not None and p.getparent() is not None:
+                _pad_tail(p)
+                p.drop_tree()
+    text = " ".join(doc.itertext())
+    return _WS_RE.sub(" ", text).strip()
 
 def word_tokens(text: str) -> List[str]:
-    return re.findall(r"[A-Za-z0-9]+", (text or "").lower())
+    return _WORD_RE.findall((text or "").lower())
 
 BOILER = set("""
 jio jiopay business products partner program contact us about us privacy policy terms conditions grievance redressal policy
@@ -45,55 +84,109 @@ merchant onboarding kyc aml billpay point of sale upi hub biller centre payment
 
 def noise_ratio(tokens: List[str]) -> float:
     if not tokens: return 1.0
-    return sum(1 for t in tokens if t in BOILER) / max(1, len(tokens))
+    # counts every boilerplate occurrence (not distinct words), without a Python-level loop
+    return sum(map(BOILER.__contains__, tokens)) / max(1, len(tokens))
 
-# ---------- pipeline A: requests+bs4 ----------
-def run_requests(urls: List[str]) -> List[Dict]:
-    rows = []
+# ---------- pipeline A: plain HTTP (aiohttp) ----------
+async def _fetch_text(sess: aiohttp.ClientSession, u: str) -> str:
+    # retry connection-level failures only, with exponential backoff
+    for attempt in range(REQ_RETRIES + 1):
+        try:
+            async with sess.get(u) as r:
+                r.raise_for_status()
+                return await r.text()
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if attempt == REQ_RETRIES:
+                raise
+            await asyncio.sleep(0.3 * (2 ** attempt))
+
+async def run_requests_async(urls: List[str]) -> (List[Dict], float):
     t0 = time.time()
-    for u in tqdm(urls, desc="Requests+BS4"):
+    pbar = tqdm(total=len(urls), desc="Requests", position=0)
+
+    async def fetch(sess: aiohttp.ClientSession, u: str) -> Dict:
         try:
-            r = requests.get(u, headers=HEADERS, timeout=REQUEST_TIMEOUT)
-            r.raise_for_status()
-            text = parse_text_from_html(r.text)
+            html = await _fetch_text(sess, u)
+            # parse off the loop so neither pipeline's timer absorbs the other's CPU work
+            text = await asyncio.to_thread(parse_text_from_html, html)
         except Exception:
             text = ""
-        rows.append({"url": u, "text": text})
+        pbar.update(1)
+        return {"url": u, "text": text}
+
+    # one pooled keep-alive connector; gather keeps results in input order
+    connector = aiohttp.TCPConnector(limit=32, limit_per_host=REQ_PER_HOST)
+    async with aiohttp.ClientSession(connector=connector, headers=HEADERS,
+                                     # per-socket limits like requests' timeout=; time queued for a
+                                     # pooled connection doesn't count against a URL
+                                     timeout=aiohttp.ClientTimeout(total=None, sock_connect=REQUEST_TIMEOUT,
+                                                                   sock_read=REQUEST_TIMEOUT)) as sess:
+        rows = await asyncio.gather(*(fetch(sess, u) for u in urls))
+    pbar.close()
     elapsed = time.time() - t0
-    OUT_REQ.write_text(json.dumps(rows, ensure_ascii=False, indent=2), encoding="utf-8")
+    OUT_REQ.write_bytes(orjson.dumps(rows, option=orjson.OPT_INDENT_2))
     print(f"Requests pipeline -> {OUT_REQ} | elapsed {elapsed:.2f}s")
     return rows, elapsed
 
 # ---------- pipeline B: headless (Playwright) ----------
+async def _block_heavy(route):
+    if route.request.resource_type in PW_BLOCKED_RESOURCES:
+        await route.abort()
+    else:
+        await route.continue_()
+
 async def run_playwright_async(urls: List[str]) -> (List[Dict], float):
-    rows = []
     t0 = time.time()
     async with async_playwright() as p:
         browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page(user_agent="Mozilla/5.0")
-        for u in tqdm(urls, desc="Playwright"):
-            try:
-                await page.goto(u, wait_until="networkidle", timeout=PW_TIMEOUT_MS)
-                # gentle scroll for lazy content
+        sem = asyncio.Semaphore(PW_MAX_PARALLEL)
+        pbar = tqdm(total=len(urls), desc="Playwright", position=1)
+
+        # one isolated context per URL, at most PW_MAX_PARALLEL in flight
+        async def bound_fetch(u: str) -> Dict:
+            async with sem:
+                ctx = await browser.new_context(user_agent="Mozilla/5.0")
                 try:
-                    await page.evaluate("""async () => {
-                      let h=document.body.scrollHeight, y=0;
-                      while (y<h){ y+=Math.max(300, Math.floor(window.innerHeight*0.9));
-                        window.scrollTo(0,y); await new Promise(r=>setTimeout(r,80));
-                        h=document.body.scrollHeight;}
-                    }""")
-                except: pass
-                html = await page.content()
-                text = parse_text_from_html(html)
-            except Exception:
-                text = ""
-            rows.append({"url": u, "text": text})
+                    await ctx.route("**/*", _block_heavy)
+                    page = await ctx.new_page()
+                    # DOM ready + first content, instead of networkidle (analytics beacons keep it busy)
+                    await page.goto(u, wait_until="domcontentloaded", timeout=PW_TIMEOUT_MS)
+                    try:
+                        await page.wait_for_selector(PW_READY_SELECTOR, timeout=PW_READY_TIMEOUT_MS)
+                    except: pass
+                    # gentle scroll for lazy content
+                    try:
+                        await page.evaluate("""async () => {
+                          let h=document.body.scrollHeight, y=0;
+                          while (y<h){ y+=Math.max(300, Math.floor(window.innerHeight*0.9));
+                            window.scrollTo(0,y); await new Promise(r=>setTimeout(r,80));
+                            h=document.body.scrollHeight;}
+                        }""")
+                    except: pass
+                    html = await page.content()
+                    text = await asyncio.to_thread(parse_text_from_html, html)
+                except Exception:
+                    text = ""
+                finally:
+                    await ctx.close()
+                    pbar.update(1)
+            return {"url": u, "text": text}
+
+        # gather preserves input order
+        rows = await asyncio.gather(*(bound_fetch(u) for u in urls))
+        pbar.close()
         await browser.close()
     elapsed = time.time() - t0
-    OUT_PW.write_text(json.dumps(rows, ensure_ascii=False, indent=2), encoding="utf-8")
+    OUT_PW.write_bytes(orjson.dumps(rows, option=orjson.OPT_INDENT_2))
     print(f"Playwright pipeline -> {OUT_PW} | elapsed {elapsed:.2f}s")
     return rows, elapsed
 
+async def run_pipelines(urls: List[str]):
+    # both pipelines are network-bound, so they share one event loop
+    req_task = asyncio.create_task(run_requests_async(urls))
+    pw_task = asyncio.create_task(run_playwright_async(urls))
+    return await asyncio.gather(req_task, pw_task)
+
 def evaluate(name: str, rows: List[Dict], elapsed_sec: float, total_attempted: int) -> (Dict, List[Dict]):
     per = []
     success = 0
@@ -134,10 +227,9 @@ def main():
     total = len(urls)
     print(f"Evaluating {total} URLs")
 
-    req_rows, req_elapsed = run_requests(urls)
-    pw_rows,  pw_elapsed  = asyncio.run(run_playwright_async(urls))
+    (req_rows, req_elapsed), (pw_rows, pw_elapsed) = asyncio.run(run_pipelines(urls))
 
-    req_summary, req_per = evaluate("BS4 (requests)", req_rows, req_elapsed, total)
+    req_summary, req_per = evaluate("HTTP (aiohttp + lxml)", req_rows, req_elapsed, total)
     pw_summary,  pw_per  = evaluate("Headless (Playwright)", pw_rows, pw_elapsed, total)
 
     # save tables
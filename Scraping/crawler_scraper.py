@@ -1,12 +1,22 @@
-import asyncio, json, re
+import asyncio, re
+import orjson
 from pathlib import Path
 from hashlib import md5
-from bs4 import BeautifulSoup
+from lxml import html as lxml_html, etree
 from playwright.async_api import async_playwright, TimeoutError as PWTimeout
 
 START_URL = "https://www.jiopay.com/business"
 OUT_DIR = Path("data"); OUT_DIR.mkdir(exist_ok=True)
 OUT_JSON = OUT_DIR / "jiopay_sections.json"
+_WS_RE = re.compile(r"\s+")
+
+# landing tiles are rendered client-side; wait for one instead of networkidle
+READY_SELECTOR = "text=Payment Gateway"
+READY_TIMEOUT_MS = 10000
+BACK_TIMEOUT_MS = 15000
+BACK_CONFIRM_MS = 3000
+# stylesheets stay on: the tile clicks depend on real layout/visibility
+BLOCKED_RESOURCES = frozenset({"image", "media", "font"})
 
 # Sections visible in your screenshot – click by text:
 SECTION_LABELS = [
@@ -19,53 +29,55 @@ SECTION_LABELS = [
     "Merchant Onboarding & KYC-AML Policy", "BillPay Terms & Conditions",
 ]
 
+_DROP_TAGS = ("script","style","noscript","svg","nav","header","footer")
+
 def clean_text(html: str) -> str:
-    soup = BeautifulSoup(html, "lxml")
-    for tag in soup(["script","style","noscript","svg","nav","header","footer"]):
-        tag.decompose()
-    text = soup.get_text(separator=" ", strip=True)
-    return re.sub(r"\s+", " ", text).strip()
+    """
+    >>> clean_text("<div>Call us<svg><path/></svg>today</div>")
+    'Call us today'
+    >>> clean_text("<nav>x</nav>")
+    ''
+    """
+    if not html or not html.strip():
+        return ""
+    try:
+        # document_fromstring: root is always <html>, so a dropped tag never is
+        doc = lxml_html.document_fromstring(html)
+    except ValueError:
+        # str input carrying an XML encoding declaration
+        doc = lxml_html.document_fromstring(html.encode("utf-8"))
+    except etree.ParserError:
+        return ""
+    # strip_elements splices each tail onto the preceding text; keep a word
+    # boundary there, as get_text(" ") did
+    for el in doc.iter(etree.Comment, *_DROP_TAGS):
+        if el.tail:
+            el.tail = " " + el.tail
+    etree.strip_elements(doc, etree.Comment, *_DROP_TAGS, with_tail=False)
+    text = " ".join(doc.itertext())
+    return _WS_RE.sub(" ", text).strip()
 
 async def expand_all_faqs(page):
     """
     Expand accordion-style FAQs the site uses (div[tabindex='0'] + chevron).
     Then return a list of {"question","answer"}.
+    Opens and extracts in a single page.evaluate round-trip.
     """
-    faqs = []
     try:
-        # Click all toggle chevrons if present
-        toggles = await page.query_selector_all("div[tabindex='0']")
-        for t in toggles:
-            try:
-                chev = await t.query_selector("div.css-146c3p1.r-kb43wt")
-                if chev:
-                    await chev.click()
-                    await page.wait_for_timeout(100)
-            except:
-                pass
-
-        # Extract Q/A
-        toggles = await page.query_selector_all("div[tabindex='0']")
-        for t in toggles:
-            try:
-                qel = await t.query_selector("div.css-146c3p1.r-op4f77")
-                q = (await qel.inner_text()).strip() if qel else ""
-                ans = await page.evaluate(
-                    """(el) => {
-                        const w = el.parentElement?.parentElement;
-                        if (!w) return "";
-                        const a = w.querySelector("div[data-testid='ViewTestId'], div.css-146c3p1.r-1xt3ije");
-                        return a ? a.innerText : "";
-                    }""",
-                    t
-                )
-                if q and ans:
-                    faqs.append({"question": q, "answer": ans.strip()})
-            except:
-                continue
+        return await page.evaluate("""async () => {
+            const toggles = [...document.querySelectorAll("div[tabindex='0']")];
+            toggles.forEach(t => { try { t.querySelector("div.css-146c3p1.r-kb43wt")?.click(); } catch (e) {} });
+            // one settle tick for the answers to render, instead of a sleep per toggle
+            await new Promise(r => setTimeout(r, 150));
+            return [...document.querySelectorAll("div[tabindex='0']")].map(t => {
+                const q = t.querySelector("div.css-146c3p1.r-op4f77")?.innerText || "";
+                const w = t.parentElement?.parentElement;
+                const a = w?.querySelector("div[data-testid='ViewTestId'], div.css-146c3p1.r-1xt3ije")?.innerText || "";
+                return {question: q.trim(), answer: a.trim()};
+            }).filter(x => x.question && x.answer);
+        }""")
     except:
-        pass
-    return faqs
+        return []
 
 async def get_body_hash(page) -> str:
     try:
@@ -77,7 +89,7 @@ async def get_body_hash(page) -> str:
 async def click_by_text(page, text: str) -> bool:
     """
     Click an element showing the exact visible text (div-based nav).
-    Tries get_by_text first, then a generic query.
+    Tries get_by_text first, then a single in-page scan of div-based candidates.
     Returns True if we think the click was delivered.
     """
     try:
@@ -91,32 +103,59 @@ async def click_by_text(page, text: str) -> bool:
         await page.wait_for_timeout(200)
         return True
     except:
-        # fallback query for divs with dir="auto"
+        # fallback: find + click the first exact-text div/span in one JS pass
         try:
-            locs = await page.query_selector_all("div[dir='auto'], span[dir='auto'], div[role='button']")
-            for el in locs:
-                try:
-                    t = (await el.inner_text()).strip()
-                    if t == text:
-                        await el.scroll_into_view_if_needed(timeout=1000)
-                        try:
-                            await el.click(timeout=800)
-                        except:
-                            await page.evaluate("(el)=>el.click()", el)
-                        await page.wait_for_timeout(200)
-                        return True
-                except:
-                    continue
+            if await page.evaluate(
+                """(label) => {
+                    for (const el of document.querySelectorAll("div[dir='auto'], span[dir='auto'], div[role='button']")) {
+                        if ((el.innerText || "").trim() === label) {
+                            el.scrollIntoView({block: "center"});
+                            el.click();
+                            return true;
+                        }
+                    }
+                    return false;
+                }""",
+                text
+            ):
+                await page.wait_for_timeout(200)
+                return True
         except:
             pass
     return False
 
+async def _block_heavy(route):
+    if route.request.resource_type in BLOCKED_RESOURCES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+async def wait_ready(page):
+    try:
+        await page.wait_for_selector(READY_SELECTOR, timeout=READY_TIMEOUT_MS)
+    except:
+        pass
+
+async def back_to_landing(page) -> bool:
+    """
+    History-back to the landing page and confirm the tiles are there.
+    Returns False if the landing state could not be confirmed.
+    """
+    try:
+        await page.go_back(wait_until="domcontentloaded", timeout=BACK_TIMEOUT_MS)
+        await page.wait_for_selector(READY_SELECTOR, timeout=BACK_CONFIRM_MS)
+        return page.url == START_URL
+    except:
+        return False
+
 async def scrape_sections():
     results = []
     async with async_playwright() as p:
         browser = await p.chromium.launch(headless=True)
         page = await browser.new_page(user_agent="Mozilla/5.0")
-        await page.goto(START_URL, wait_until="networkidle", timeout=60000)
+        await page.route("**/*", _block_heavy)
+        await page.goto(START_URL, wait_until="domcontentloaded", timeout=60000)
+        await wait_ready(page)
 
         # Scroll fully to ensure bottom grid is rendered
         try:
@@ -180,17 +219,16 @@ async def scrape_sections():
                 "faqs": faqs
             })
 
-            # If route changed, best-effort go back to the main page for the next tile
-            if url_now != START_URL:
-                try:
-                    await page.go_back(wait_until="networkidle", timeout=60000)
-                except:
-                    await page.goto(START_URL, wait_until="networkidle", timeout=60000)
+            # Still on the landing route: the tiles are already there, nothing to undo.
+            # Otherwise go back; only a failed go_back pays for a full reload.
+            if url_now != START_URL and not await back_to_landing(page):
+                await page.goto(START_URL, wait_until="domcontentloaded", timeout=60000)
+                await wait_ready(page)
 
         await browser.close()
     return results
 
 if __name__ == "__main__":
     data = asyncio.run(scrape_sections())
-    OUT_JSON.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+    OUT_JSON.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
     print(f"Saved {len(data)} section snapshots -> {OUT_JSON}")